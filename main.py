@@ -1,4 +1,5 @@
 import threading
+import logging
 import time
 import csv
 import json
@@ -23,6 +24,16 @@ from src.email_service import send_verification_email, send_welcome_email
 from dotenv import load_dotenv
 load_dotenv()
 
+# Show INFO output from our own modules (e.g. sitemap discovery summaries)
+# with the same bare format as print. The handler sits on the 'src' logger
+# only, so the root logger and third-party output are left untouched
+log_handler = logging.StreamHandler()
+log_handler.setFormatter(logging.Formatter('%(message)s'))
+src_logger = logging.getLogger('src')
+src_logger.addHandler(log_handler)
+src_logger.setLevel(logging.INFO)
+src_logger.propagate = False
+
 # Parse command line arguments
 parser = argparse.ArgumentParser(description='LibreCrawl - SEO Spider Tool')
 parser.add_argument('--local', '-l', action='store_true',
@@ -689,13 +700,9 @@ def import_bulk_urls():
         if '<' in content and '>' in content:
             try:
                 root = ET.fromstring(content)
-                # Remove namespace prefixes
-                for elem in root.iter():
-                    if '}' in elem.tag:
-                        elem.tag = elem.tag.split('}')[1]
-                
-                # Extract URLs from <loc> tags
-                for loc in root.findall('.//loc'):
+
+                # Extract URLs from <loc> tags ({*} matches any or no namespace)
+                for loc in root.findall('.//{*}loc'):
                     if loc.text:
                         urls.append(loc.text.strip())
                 
@@ -814,8 +821,7 @@ def start_crawl():
         
         # Add all bulk URLs at depth 0
         if crawler.link_manager:
-            for bulk_url in bulk_urls:
-                crawler.link_manager.add_url(bulk_url, 0)
+            crawler.link_manager.add_urls((bulk_url, 0) for bulk_url in bulk_urls)
             
             # Update stats
             crawler.stats['discovered'] = crawler.link_manager.get_stats()['discovered']
@@ -1224,7 +1230,7 @@ def load_crawl_into_session(crawl_id):
             # Rebuild links_set
             crawler.link_manager.links_set.clear()
             for link in links:
-                link_key = f"{link['source_url']}|{link['target_url']}"
+                link_key = (link['source_url'], link['target_url'])
                 crawler.link_manager.links_set.add(link_key)
 
         # Load issues into issue detector
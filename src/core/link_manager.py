@@ -1,7 +1,149 @@
 """Link management and extraction"""
+import re
+import sys
 import threading
-from urllib.parse import urljoin, urlparse
-from collections import deque
+from functools import lru_cache
+from itertools import chain
+from urllib.parse import urljoin, urlparse, urlsplit
+from collections import defaultdict, deque
+from lxml import etree
+
+# Number of independently locked shards for the "Linked From" index
+_SOURCE_SHARDS = 16
+
+# hrefs that never point at a crawlable page
+_SKIP_PREFIXES = ('#', 'mailto:', 'tel:', 'javascript:', 'data:')
+
+# Link placement keywords, matched against an element's classes and id
+_FOOTER_RE = re.compile(r'footer', re.I)
+_NAV_RE = re.compile(r'nav|menu|header', re.I)
+_NAV_TAGS = frozenset(('nav', 'header'))
+
+
+@lru_cache(maxsize=65536)
+def _cached_urlsplit(url):
+    """Cached urlsplit for absolute URLs
+
+    urlsplit skips the extra ;params pass urlparse does on every call.
+    """
+    return urlsplit(url)
+
+
+@lru_cache(maxsize=4096)
+def _clean_domain(netloc):
+    """Lowercase a domain and strip a leading 'www.'"""
+    return netloc.lower().removeprefix('www.')
+
+
+def _canonicalize(base, href):
+    """Resolve href against base and strip the fragment
+
+    Returns:
+        tuple: (clean_url, parsed) where parsed is the urlsplit result
+    """
+    # Root-relative and absolute hrefs only depend on the base origin, so key
+    # the cache on it - site navigation then resolves once for the whole crawl
+    if href.startswith(('/', 'http://', 'https://')):
+        parsed_base = _cached_urlsplit(base)
+        base = f"{parsed_base.scheme}://{parsed_base.netloc}"
+    return _canonicalize_cached(base, href)
+
+
+@lru_cache(maxsize=65536)
+def _canonicalize_cached(base, href):
+    """Cached body of _canonicalize"""
+    absolute_url = urljoin(base, href)
+    parsed = _cached_urlsplit(absolute_url)
+    path = parsed.path
+    if ';' in path:
+        # Keep urlparse semantics: ;params on the last segment are dropped
+        path = urlparse(absolute_url).path
+    clean_url = f"{parsed.scheme}://{parsed.netloc}{path}"
+    if parsed.query:
+        clean_url += f"?{parsed.query}"
+    # Intern so every set/dict/link record shares one string per unique URL
+    return sys.intern(clean_url), parsed
+
+
+class _SoupNodes:
+    """Node accessors for BeautifulSoup documents"""
+
+    @staticmethod
+    def find_links(doc):
+        return [(link, link['href']) for link in doc.find_all('a', href=True)]
+
+    @staticmethod
+    def name(node):
+        return getattr(node, 'name', None)
+
+    @staticmethod
+    def ancestors(node):
+        return node.parents
+
+    @staticmethod
+    def class_string(node):
+        return ' '.join(node.get('class') or ())
+
+    @staticmethod
+    def sibling_position(node, tag_name):
+        """Return (1-based index among same-tag siblings, whether a later one exists)"""
+        index = 1
+        sibling = node.previous_sibling
+        while sibling is not None:
+            if sibling.name == tag_name:
+                index += 1
+            sibling = sibling.previous_sibling
+        if index > 1:
+            return index, False
+
+        sibling = node.next_sibling
+        while sibling is not None:
+            if sibling.name == tag_name:
+                return index, True
+            sibling = sibling.next_sibling
+        return index, False
+
+    @staticmethod
+    def text(node):
+        return node.get_text()
+
+
+# Same as lxml.html's text_content(), usable on plain etree elements
+_text_content = etree.XPath('string()', smart_strings=False)
+
+# Nearest element (self included) whose id anchors the DOM path
+_id_anchor = etree.XPath("ancestor-or-self::*[string-length(@id) > 0 and not(self::html)][1]")
+
+
+class _LxmlNodes:
+    """Node accessors for lxml etree documents (fast path)"""
+
+    @staticmethod
+    def find_links(doc):
+        return [(link, link.get('href')) for link in doc.xpath('//a[@href]')]
+
+    @staticmethod
+    def name(node):
+        # Comments and processing instructions have a non-string tag
+        tag = node.tag
+        return tag if isinstance(tag, str) else None
+
+    @staticmethod
+    def ancestors(node):
+        return node.iterancestors()
+
+    @staticmethod
+    def class_string(node):
+        return node.get('class') or ''
+
+    @staticmethod
+    def text(node):
+        return _text_content(node)
+
+
+def _nodes_for(doc):
+    """Pick the node accessors matching the parsed document type"""
+    return _LxmlNodes if etree.iselement(doc) else _SoupNodes
 
 
 class LinkManager:
@@ -9,101 +151,121 @@ class LinkManager:
 
     def __init__(self, base_domain):
         self.base_domain = base_domain
+        self._base_domain_clean = _clean_domain(base_domain or '')
         self.visited_urls = set()
         self.discovered_urls = deque()
-        self.all_discovered_urls = set()
+        self.all_discovered_urls = set()  # Frontier dedup set - superset of visited_urls
         self.all_links = []
-        self.links_set = set()
-        self.source_pages = {}  # Maps target_url -> list of source_urls
+        self.links_set = set()  # (source_url, target_url) pairs
+        # Maps target_url -> source_urls (dict as an insertion-ordered set, so
+        # linked_from keeps first-seen order), sharded by hash(target_url)
+        # so lookups and updates don't contend with the crawl queue lock
+        self.source_pages = [defaultdict(dict) for _ in range(_SOURCE_SHARDS)]
+        self.source_locks = [threading.Lock() for _ in range(_SOURCE_SHARDS)]
 
         self.urls_lock = threading.Lock()
         self.links_lock = threading.Lock()
 
-    def extract_links(self, soup, current_url, depth, should_crawl_callback):
-        """Extract links from HTML and add to discovery queue"""
-        links = soup.find_all('a', href=True)
-
-        for link in links:
-            href = link['href'].strip()
-            if not href or href.startswith('#') or href.startswith('mailto:') or href.startswith('tel:'):
+        # Incremental url -> status_code index, fed from the tail of crawl_results
+        self._status_by_url = {}
+        self._status_source = None  # crawl_results list the index was built from
+        self._status_synced_len = 0
+        self._dirty_targets = set()  # URLs whose status changed since the last link update
+        self.status_lock = threading.Lock()
+
+        # target_url -> indices into all_links, extended as links are added
+        self._links_by_target = {}
+        self._indexed_links = None  # all_links list the index was built from
+        self._indexed_count = 0
+
+    def extract_links(self, doc, current_url, depth, should_crawl_callback):
+        """Extract links from HTML and add to discovery queue
+
+        doc may be a BeautifulSoup document or an lxml.html element.
+        """
+        links = _nodes_for(doc).find_links(doc)
+        current_url = sys.intern(current_url)
+
+        # Resolve hrefs without holding any lock; dict keeps discovery order
+        new_sources = {}
+        for link, href in links:
+            href = href.strip()
+            if not href or href.startswith(_SKIP_PREFIXES):
                 continue
 
-            # Convert relative URLs to absolute
-            absolute_url = urljoin(current_url, href)
+            # Convert relative URLs to absolute and clean (remove fragment)
+            clean_url, _ = _canonicalize(current_url, href)
+            new_sources[clean_url] = None
+
+        if not new_sources:
+            return
 
-            # Clean URL (remove fragment)
-            parsed = urlparse(absolute_url)
-            clean_url = f"{parsed.scheme}://{parsed.netloc}{parsed.path}"
-            if parsed.query:
-                clean_url += f"?{parsed.query}"
+        # Track source pages for these URLs
+        self._add_source_pages(new_sources, current_url)
 
-            # Thread-safe checking and adding
+        # Pick out unseen URLs under a single lock
+        with self.urls_lock:
+            candidates = [clean_url for clean_url in new_sources
+                          if clean_url not in self.all_discovered_urls and
+                          clean_url != current_url]
+
+        # Check if each URL should be crawled (may fetch robots.txt, so no lock held)
+        new_discoveries = [(clean_url, depth) for clean_url in candidates
+                           if should_crawl_callback(clean_url, depth)]
+
+        if new_discoveries:
             with self.urls_lock:
-                # Track source page for this URL
-                if clean_url not in self.source_pages:
-                    self.source_pages[clean_url] = []
-                if current_url not in self.source_pages[clean_url]:
-                    self.source_pages[clean_url].append(current_url)
-
-                if (clean_url not in self.visited_urls and
-                    clean_url not in self.all_discovered_urls and
-                    clean_url != current_url):
-
-                    # Check if this URL should be crawled
-                    if should_crawl_callback(clean_url, depth):
+                for clean_url, url_depth in new_discoveries:
+                    # Re-check: another thread may have queued it meanwhile
+                    if clean_url not in self.all_discovered_urls:
                         self.all_discovered_urls.add(clean_url)
-                        self.discovered_urls.append((clean_url, depth))
+                        self.discovered_urls.append((clean_url, url_depth))
 
-    def collect_all_links(self, soup, source_url, crawl_results):
-        """Collect all links for the Links tab display"""
-        links = soup.find_all('a', href=True)
+    def collect_all_links(self, doc, source_url, crawl_results):
+        """Collect all links for the Links tab display
 
-        for link in links:
-            href = link['href'].strip()
-            if not href or href.startswith('#'):
-                continue
+        doc may be a BeautifulSoup document or an lxml.html element.
+        """
+        nodes = _nodes_for(doc)
+        links = nodes.find_links(doc)
+        source_url = sys.intern(source_url)
 
-            # Get anchor text
-            anchor_text = link.get_text().strip()[:100]
+        self._sync_status_lookup(crawl_results)
+        status_lookup = self._status_by_url
+
+        # Build this page's links locally, then merge under one lock each
+        new_targets = {}
+        new_links = []
+        new_link_keys = set()
 
-            # Handle special link types
-            if href.startswith('mailto:') or href.startswith('tel:'):
+        for link, href in links:
+            href = href.strip()
+            if not href or href.startswith(_SKIP_PREFIXES):
                 continue
 
+            # Get anchor text
+            anchor_text = nodes.text(link).strip()[:100]
+
             # Convert relative URLs to absolute
             try:
-                absolute_url = urljoin(source_url, href)
-                parsed_target = urlparse(absolute_url)
+                # and clean URL (remove fragment)
+                clean_url, parsed_target = _canonicalize(source_url, href)
 
-                # Clean URL (remove fragment)
-                clean_url = f"{parsed_target.scheme}://{parsed_target.netloc}{parsed_target.path}"
-                if parsed_target.query:
-                    clean_url += f"?{parsed_target.query}"
-
-                # Determine if link is internal or external
-                target_domain = parsed_target.netloc.lower()
-                base_domain = self.base_domain.lower() if self.base_domain else ''
-                
-                # Remove 'www.' prefix if present at the start
-                target_domain_clean = target_domain[4:] if target_domain.startswith('www.') else target_domain
-                base_domain_clean = base_domain[4:] if base_domain.startswith('www.') else base_domain
+                # Determine if link is internal or external ('www.' ignored)
+                target_domain_clean = _clean_domain(parsed_target.netloc)
                 
                 # Only consider internal if both domains are non-empty and match
-                is_internal = (target_domain_clean and base_domain_clean and 
-                              target_domain_clean == base_domain_clean)
+                is_internal = (target_domain_clean and self._base_domain_clean and 
+                              target_domain_clean == self._base_domain_clean)
 
                 # Find the status of the target URL if we've crawled it
-                target_status = None
-                for result in crawl_results:
-                    if result['url'] == clean_url:
-                        target_status = result['status_code']
-                        break
+                target_status = status_lookup.get(clean_url)
 
                 # Determine placement (navigation, footer, body)
-                placement = self._detect_link_placement(link)
+                placement = self._detect_link_placement(link, nodes)
                 
                 # Generate DOM path (XPath-like)
-                link_path = self._get_dom_path(link)
+                link_path = self._get_dom_path(link, nodes)
 
                 link_data = {
                     'source_url': source_url,
@@ -116,132 +278,224 @@ class LinkManager:
                     'link_path': link_path
                 }
 
-                # Track source page for this URL (for "Linked From" feature)
-                with self.urls_lock:
-                    if clean_url not in self.source_pages:
-                        self.source_pages[clean_url] = []
-                    if source_url not in self.source_pages[clean_url]:
-                        self.source_pages[clean_url].append(source_url)
+                new_targets[clean_url] = None
 
-                # Thread-safe adding to links collection with duplicate checking
-                with self.links_lock:
-                    link_key = f"{link_data['source_url']}|{link_data['target_url']}"
-
-                    if link_key not in self.links_set:
-                        self.links_set.add(link_key)
-                        self.all_links.append(link_data)
+                link_key = (source_url, clean_url)
+                if link_key not in new_link_keys:
+                    new_link_keys.add(link_key)
+                    new_links.append((link_key, link_data))
 
             except Exception:
                 continue
 
-    def _detect_link_placement(self, link_element):
+        if not new_targets:
+            return
+
+        # Track source pages for these URLs (for "Linked From" feature)
+        self._add_source_pages(new_targets, source_url)
+
+        # Thread-safe adding to links collection with duplicate checking
+        with self.links_lock:
+            for link_key, link_data in new_links:
+                if link_key not in self.links_set:
+                    self.links_set.add(link_key)
+                    self.all_links.append(link_data)
+
+    def _add_source_pages(self, target_urls, source_url):
+        """Record source_url as linking to each target, locking each shard once"""
+        by_shard = defaultdict(list)
+        for target_url in target_urls:
+            by_shard[hash(target_url) % _SOURCE_SHARDS].append(target_url)
+
+        for shard_index, shard_targets in by_shard.items():
+            shard = self.source_pages[shard_index]
+            with self.source_locks[shard_index]:
+                for target_url in shard_targets:
+                    shard[target_url][source_url] = None
+
+    def _sync_status_lookup(self, crawl_results):
+        """Record the status of any crawl results added since the last sync
+
+        crawl_results is the status index's only input, so rebuilding it
+        loses nothing. The list is append-only during a crawl, so only its
+        new tail is read; a different or shorter list (reset/resume/load)
+        starts over.
+        """
+        if crawl_results is self._status_source and len(crawl_results) == self._status_synced_len:
+            return
+
+        with self.status_lock:
+            if crawl_results is not self._status_source or len(crawl_results) < self._status_synced_len:
+                self._status_by_url = {}
+                self._status_source = crawl_results
+                self._status_synced_len = 0
+
+            new_results = crawl_results[self._status_synced_len:]
+            self._status_synced_len += len(new_results)
+
+            for result in new_results:
+                url = result['url']
+                self._status_by_url[url] = result['status_code']
+                self._dirty_targets.add(url)
+
+    def _sync_links_index(self):
+        """Index links added since the last update (caller holds links_lock)
+
+        Newly indexed links also pick up any status already known for their target.
+        """
+        links = self.all_links
+        if links is not self._indexed_links or len(links) < self._indexed_count:
+            self._links_by_target = {}
+            self._indexed_links = links
+            self._indexed_count = 0
+
+        status_lookup = self._status_by_url
+        for index in range(self._indexed_count, len(links)):
+            link = links[index]
+            target_url = link['target_url']
+            self._links_by_target.setdefault(target_url, []).append(index)
+            if target_url in status_lookup:
+                link['target_status'] = status_lookup[target_url]
+
+        self._indexed_count = len(links)
+
+    def _detect_link_placement(self, link_element, nodes=_SoupNodes):
         """Detect where on the page a link is placed"""
+        footer_search = _FOOTER_RE.search
+        nav_search = _NAV_RE.search
+        name_of = nodes.name
+        class_string = nodes.class_string
+
         # Check parent elements up the tree
-        current = link_element.parent
+        for current in nodes.ancestors(link_element):
+            name = name_of(current)
+            if not name:
+                break
 
-        while current and current.name:
             # Check for footer
-            if current.name == 'footer':
+            if name == 'footer':
                 return 'footer'
 
-            # Check for footer by class/id
-            classes = current.get('class', [])
-            element_id = current.get('id', '')
-            classes_str = ' '.join(classes).lower() if classes else ''
+            # Check for footer / navigation by class/id
+            haystack = class_string(current) + ' ' + (current.get('id') or '')
 
-            if 'footer' in classes_str or 'footer' in element_id.lower():
+            if footer_search(haystack):
                 return 'footer'
 
-            # Check for navigation
-            if current.name in ['nav', 'header']:
+            if name in _NAV_TAGS or nav_search(haystack):
                 return 'navigation'
 
-            # Check for navigation by class/id
-            if any(keyword in classes_str or keyword in element_id.lower()
-                   for keyword in ['nav', 'menu', 'header']):
-                return 'navigation'
-
-            current = current.parent
-
         # Default to body if not in nav or footer
         return 'body'
 
-    def _get_dom_path(self, element):
+    def _get_dom_path(self, element, nodes=_SoupNodes):
         """Generate XPath-like DOM path for an element (similar to Screaming Frog format)"""
-        if not element or not element.name:
+        if element is None or not nodes.name(element):
             return ''
+
+        if nodes is _LxmlNodes:
+            return self._get_lxml_dom_path(element)
         
         path_parts = []
-        current = element
         
         # Walk up the tree to build path
-        while current and current.name:
-            tag_name = current.name.lower()
+        for current in chain((element,), nodes.ancestors(element)):
+            tag = nodes.name(current)
+            if not tag:
+                break
+            tag_name = tag.lower()
             
             # Skip html tag, start from body
             if tag_name == 'html':
                 break
             
-            # Build path segment
-            segment = tag_name
-            
-            # Add id if available (most specific)
+            # An id is unique on the page, so anchor the path there instead of
+            # walking the remaining ancestors up to body
             element_id = current.get('id')
             if element_id:
-                segment += f"[@id='{element_id}']"
+                path_parts.append(f"{tag_name}[@id='{element_id}']")
+                break
+
+            # Index by position among same-tag siblings; the first of its kind
+            # is only indexed when a later sibling shares the tag
+            index, has_later = nodes.sibling_position(current, tag)
+            if index > 1:
+                path_parts.append(f"{tag_name}[{index}]")
+            elif has_later:
+                path_parts.append(f"{tag_name}[1]")
             else:
-                # Count siblings with same tag name for index
-                parent = current.parent
-                if parent:
-                    # Filter to only element siblings (not text nodes)
-                    siblings = [sib for sib in parent.children 
-                               if hasattr(sib, 'name') and sib.name and sib.name == tag_name]
-                    if len(siblings) > 1:
-                        try:
-                            index = siblings.index(current) + 1
-                            segment += f"[{index}]"
-                        except ValueError:
-                            # Current not in siblings list (shouldn't happen, but handle gracefully)
-                            pass
-            
-            path_parts.insert(0, segment)
-            current = current.parent
-            
+                path_parts.append(tag_name)
+
             # Stop at body (Screaming Frog style starts from body)
             if tag_name == 'body':
                 break
-        
-        # Join with / separator, starting with //body
+
+        # Join with / separator, starting with //body (or //tag[@id=...])
         if path_parts:
-            return '//' + '/'.join(path_parts)
+            return '//' + '/'.join(reversed(path_parts))
+        return ''
+
+    def _get_lxml_dom_path(self, element):
+        """Same path as _get_dom_path, built by libxml2's getpath()
+
+        getpath() already indexes a step only when same-tag siblings exist,
+        so only the id anchor / body prefix needs rewriting.
+        """
+        tree = element.getroottree()
+        path = tree.getpath(element)
+
+        anchor = _id_anchor(element)
+        if anchor:
+            anchor = anchor[0]
+            anchor_path = tree.getpath(anchor)
+            return f"//{anchor.tag.lower()}[@id='{anchor.get('id')}']{path[len(anchor_path):]}"
+
+        # Drop the leading /html so the path starts at body
+        if path.startswith('/html/'):
+            return '/' + path[5:]
         return ''
 
     def is_internal(self, url):
         """Check if URL is internal to the base domain"""
         parsed_url = urlparse(url)
-        
-        url_domain = parsed_url.netloc.lower()
-        base_domain = self.base_domain.lower() if self.base_domain else ''
-        
-        # Remove 'www.' prefix if present at the start
-        url_domain_clean = url_domain[4:] if url_domain.startswith('www.') else url_domain
-        base_domain_clean = base_domain[4:] if base_domain.startswith('www.') else base_domain
+
+        # Compare with 'www.' prefix removed
+        url_domain_clean = _clean_domain(parsed_url.netloc)
         
         # Only consider internal if both domains are non-empty and match
-        return (url_domain_clean and base_domain_clean and 
-                url_domain_clean == base_domain_clean)
+        return (url_domain_clean and self._base_domain_clean and 
+                url_domain_clean == self._base_domain_clean)
 
     def add_url(self, url, depth):
         """Add a URL to the discovery queue"""
+        url = sys.intern(url)
         with self.urls_lock:
-            if url not in self.all_discovered_urls and url not in self.visited_urls:
+            if url not in self.all_discovered_urls:
                 self.all_discovered_urls.add(url)
                 self.discovered_urls.append((url, depth))
 
+    def add_urls(self, url_depth_pairs):
+        """Add many (url, depth) pairs to the discovery queue under a single lock
+
+        Returns:
+            int: Number of URLs that were newly queued
+        """
+        url_depth_pairs = [(sys.intern(url), depth) for url, depth in url_depth_pairs]
+        added = 0
+        with self.urls_lock:
+            for url, depth in url_depth_pairs:
+                if url not in self.all_discovered_urls:
+                    self.all_discovered_urls.add(url)
+                    self.discovered_urls.append((url, depth))
+                    added += 1
+        return added
+
     def mark_visited(self, url):
         """Mark a URL as visited"""
         with self.urls_lock:
             self.visited_urls.add(url)
+            # Keep visited URLs in the dedup set so a single lookup suffices
+            self.all_discovered_urls.add(url)
 
     def get_next_url(self):
         """Get the next URL to crawl"""
@@ -261,19 +515,29 @@ class LinkManager:
 
     def update_link_statuses(self, crawl_results):
         """Update target_status for all links based on crawl results"""
-        # Build a fast lookup dict
-        status_lookup = {result['url']: result['status_code'] for result in crawl_results}
+        self._sync_status_lookup(crawl_results)
 
         with self.links_lock:
-            for link in self.all_links:
-                target_url = link['target_url']
+            with self.status_lock:
+                dirty_targets = self._dirty_targets
+                self._dirty_targets = set()
+
+            self._sync_links_index()
+            status_lookup = self._status_by_url
+
+            # Patch links that were indexed before their target was crawled
+            for target_url in dirty_targets:
                 if target_url in status_lookup:
-                    link['target_status'] = status_lookup[target_url]
+                    status = status_lookup[target_url]
+                    for index in self._links_by_target.get(target_url, ()):
+                        self.all_links[index]['target_status'] = status
 
     def get_source_pages(self, url):
         """Get list of source pages that link to this URL"""
-        with self.urls_lock:
-            return self.source_pages.get(url, []).copy()
+        shard_index = hash(url) % _SOURCE_SHARDS
+        with self.source_locks[shard_index]:
+            sources = self.source_pages[shard_index].get(url)
+            return list(sources) if sources else []
 
     def reset(self):
         """Reset all state"""
@@ -281,8 +545,22 @@ class LinkManager:
             self.visited_urls.clear()
             self.discovered_urls.clear()
             self.all_discovered_urls.clear()
-            self.source_pages.clear()
+
+        for shard, lock in zip(self.source_pages, self.source_locks):
+            with lock:
+                shard.clear()
 
         with self.links_lock:
             self.all_links.clear()
             self.links_set.clear()
+
+        with self.status_lock:
+            self._status_by_url = {}
+            self._status_source = None
+            self._status_synced_len = 0
+            self._dirty_targets = set()
+
+        with self.links_lock:
+            self._links_by_target = {}
+            self._indexed_links = None
+            self._indexed_count = 0
@@ -1,17 +1,24 @@
 """Sitemap discovery and parsing"""
+import asyncio
 import gzip
-import xml.etree.ElementTree as ET
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BufferedReader, BytesIO
 from urllib.parse import urlparse
+from lxml import etree
+
+logger = logging.getLogger(__name__)
 
 
 class SitemapParser:
     """Discovers and parses sitemap.xml files"""
 
-    def __init__(self, session, base_domain, timeout=10, js_renderer=None):
+    def __init__(self, session, base_domain, timeout=10, js_renderer=None, max_workers=8):
         self.session = session
         self.base_domain = base_domain
         self.timeout = timeout
         self.js_renderer = js_renderer
+        self.max_workers = max_workers
 
     def discover_sitemaps(self, base_url):
         """
@@ -31,26 +38,77 @@ class SitemapParser:
             f"{base_domain}/sitemap/sitemap.xml"
         ]
 
-        # Check robots.txt for sitemap declarations
-        robots_sitemaps = self._get_sitemaps_from_robots(base_domain)
-        sitemap_urls.extend(robots_sitemaps)
+        logger.info("Discovering sitemaps for %s...", base_domain)
+
+        all_urls = asyncio.run(self._discover_async(base_domain, sitemap_urls))
 
-        print(f"Discovering sitemaps for {base_domain}...")
-        print(f"Trying {len(sitemap_urls)} sitemap locations: {sitemap_urls}")
+        logger.info("Total URLs from all sitemaps: %d", len(all_urls))
+        return all_urls
+
+    async def _discover_async(self, base_domain, sitemap_urls):
+        """
+        Fetch robots.txt and all candidate sitemap locations concurrently
 
+        Everything runs on one event loop: JavaScript renders are awaited
+        directly, blocking HTTP requests and XML parsing go to a thread pool.
+        """
+        loop = asyncio.get_running_loop()
+        visited = set()  # Shared so the same sitemap is never fetched twice
+        render_slots = await self._start_renderer()
         all_urls = []
-        for sitemap_url in sitemap_urls:
-            try:
-                urls = self._parse_sitemap(sitemap_url, depth=1)
-                if urls:
-                    print(f"Got {len(urls)} URLs from {sitemap_url}")
-                all_urls.extend(urls)
-            except Exception as e:
-                print(f"Failed to parse sitemap {sitemap_url}: {e}")
-
-        print(f"Total URLs from all sitemaps: {len(all_urls)}")
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                def parse(sitemap_url):
+                    return asyncio.ensure_future(
+                        self._parse_sitemap(sitemap_url, visited, executor, render_slots))
+
+                robots_future = loop.run_in_executor(executor, self._get_sitemaps_from_robots, base_domain)
+                tasks = [(sitemap_url, parse(sitemap_url)) for sitemap_url in sitemap_urls]
+
+                # Check robots.txt for sitemap declarations
+                robots_sitemaps = await robots_future
+                tasks.extend((sitemap_url, parse(sitemap_url)) for sitemap_url in robots_sitemaps)
+                sitemap_urls.extend(robots_sitemaps)
+
+                logger.debug("Trying %d sitemap locations: %s", len(sitemap_urls), sitemap_urls)
+
+                for sitemap_url, task in tasks:
+                    try:
+                        urls = await task
+                        if urls:
+                            logger.info("Got %d URLs from %s", len(urls), sitemap_url)
+                        all_urls.extend(urls)
+                    except Exception as e:
+                        logger.warning("Failed to parse sitemap %s: %s", sitemap_url, e)
+        finally:
+            if render_slots is not None:
+                await self.js_renderer.cleanup()
+
         return all_urls
 
+    async def _start_renderer(self):
+        """
+        Start the JavaScript renderer on the discovery event loop
+
+        Playwright objects are bound to the loop that created them, so the
+        renderer is started here and cleaned up before discovery returns;
+        the crawl loop starts its own afterwards.
+
+        Returns:
+            asyncio.Semaphore: one slot per browser page, or None to use plain requests
+        """
+        if not self.js_renderer:
+            return None
+
+        try:
+            await self.js_renderer.initialize()
+        except Exception as e:
+            logger.warning("JavaScript renderer unavailable for sitemaps, using plain requests: %s", e)
+            return None
+
+        return asyncio.Semaphore(max(len(self.js_renderer.page_pool), 1))
+
     def _get_sitemaps_from_robots(self, base_domain):
         """Extract sitemap URLs from robots.txt"""
         sitemaps = []
@@ -66,106 +124,178 @@ class SitemapParser:
                         sitemaps.append(sitemap_url)
 
         except Exception as e:
-            print(f"Could not fetch robots.txt: {e}")
+            logger.warning("Could not fetch robots.txt: %s", e)
 
         return sitemaps
 
-    def _parse_sitemap(self, sitemap_url, depth=1, max_depth=10):
+    async def _parse_sitemap(self, sitemap_url, visited, executor, render_slots, depth=1, max_depth=10):
         """
-        Parse a sitemap.xml file and extract URLs
+        Parse a sitemap.xml file and extract URLs, following nested sitemap indexes
+
+        Nested sitemaps are fetched concurrently, one index level at a time.
 
         Returns:
             list: List of URLs found in the sitemap
         """
-        if depth > max_depth:
+        # visited is only touched from the event loop thread, so needs no lock
+        if sitemap_url in visited:
             return []
+        visited.add(sitemap_url)
+
+        all_urls = []
+        level = [sitemap_url]
+
+        while level and depth <= max_depth:
+            results = await asyncio.gather(*(
+                self._fetch_sitemap_locs_async(url, executor, render_slots) for url in level))
+
+            next_level = []
+            for nested_sitemaps, page_urls in results:
+                all_urls.extend(page_urls)
+
+                # Guard against sitemap indexes that reference each other
+                for nested_url in nested_sitemaps:
+                    if nested_url not in visited:
+                        visited.add(nested_url)
+                        next_level.append(nested_url)
+
+            level = next_level
+            depth += 1
+
+        return all_urls
 
+    async def _fetch_sitemap_locs_async(self, sitemap_url, executor, render_slots):
+        """Render a sitemap with JavaScript if enabled, then fetch/parse it on the thread pool"""
+        rendered = None
+        if render_slots is not None:
+            # One render per pooled browser page; more would find the pool empty
+            async with render_slots:
+                rendered = await self._render_sitemap(sitemap_url)
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, self._fetch_sitemap_locs, sitemap_url, rendered)
+
+    async def _render_sitemap(self, sitemap_url):
+        """
+        Fetch a sitemap through the JavaScript renderer (for Cloudflare-protected sites)
+
+        Returns:
+            bytes: Rendered content, or None to fall back to a plain request
+        """
+        logger.debug("Using JavaScript renderer for sitemap (Cloudflare bypass)")
+        try:
+            html_content, status_code, error = await self.js_renderer.render_page(sitemap_url)
+        except Exception as e:
+            logger.debug("JS renderer error for sitemap: %s. Falling back to requests.", e)
+            return None
+
+        if status_code == 200 and html_content:
+            logger.debug("Sitemap fetched via JS renderer: status 200")
+            return html_content.encode('utf-8')
+
+        logger.debug("JS renderer failed for sitemap, status: %s (%s). Falling back to requests.",
+                     status_code, error)
+        return None
+
+    def _fetch_sitemap_locs(self, sitemap_url, rendered=None):
+        """
+        Fetch a single sitemap and extract its entries without following nested sitemaps
+
+        Args:
+            rendered: content already fetched by the JavaScript renderer, if any
+
+        Returns:
+            tuple: (nested sitemap URLs, page URLs)
+        """
+        response = None
         try:
-            print(f"Parsing sitemap: {sitemap_url}")
+            logger.debug("Parsing sitemap: %s", sitemap_url)
             
-            # Try with JS renderer first if available (for Cloudflare-protected sites)
-            if self.js_renderer:
-                print(f"Using JavaScript renderer for sitemap (Cloudflare bypass)")
-                try:
-                    import asyncio
-                    js_result = asyncio.run(self.js_renderer.render_url(sitemap_url))
-                    if js_result and js_result.get('status_code') == 200:
-                        content = js_result.get('html', '').encode('utf-8')
-                        print(f"Sitemap fetched via JS renderer: status 200")
-                    else:
-                        print(f"JS renderer failed for sitemap, status: {js_result.get('status_code')}. Falling back to requests.")
-                        response = self.session.get(sitemap_url, timeout=self.timeout)
-                        content = response.content
-                        print(f"Sitemap response status: {response.status_code}")
-                        if response.status_code != 200:
-                            print(f"Failed to fetch sitemap {sitemap_url}: HTTP {response.status_code}")
-                            return []
-                except Exception as e:
-                    print(f"JS renderer error for sitemap: {e}. Falling back to requests.")
-                    response = self.session.get(sitemap_url, timeout=self.timeout)
-                    content = response.content
-                    print(f"Sitemap response status: {response.status_code}")
-                    if response.status_code != 200:
-                        print(f"Failed to fetch sitemap {sitemap_url}: HTTP {response.status_code}")
-                        return []
+            if rendered is not None:
+                source = BytesIO(rendered)
             else:
-                # Use regular HTTP request
-                response = self.session.get(sitemap_url, timeout=self.timeout)
-                content = response.content
-                print(f"Sitemap response status: {response.status_code}")
+                # Use regular HTTP request, streaming the body into the parser
+                response = self.session.get(sitemap_url, timeout=self.timeout, stream=True)
+                logger.debug("Sitemap response status: %s", response.status_code)
 
                 if response.status_code != 200:
-                    print(f"Failed to fetch sitemap {sitemap_url}: HTTP {response.status_code}")
-                    return []
+                    logger.debug("Failed to fetch sitemap %s: HTTP %s", sitemap_url, response.status_code)
+                    return [], []
 
-            # Handle compressed sitemaps
-            if sitemap_url.endswith('.gz'):
-                try:
-                    content = gzip.decompress(content)
-                except:
-                    pass
+                # Let urllib3 undo any Content-Encoding while streaming, and keep
+                # the stream readable at EOF (closed explicitly below)
+                response.raw.decode_content = True
+                response.raw.auto_close = False
+                source = response.raw
 
             # Parse XML
             try:
-                root = ET.fromstring(content)
-            except ET.ParseError as e:
-                print(f"XML parse error for {sitemap_url}: {e}")
-                return []
-
-            # Remove namespace prefixes for easier parsing
-            for elem in root.iter():
-                if '}' in elem.tag:
-                    elem.tag = elem.tag.split('}')[1]
-
-            all_urls = []
+                nested_sitemaps, page_urls = self._extract_locs(self._open_sitemap_stream(source))
+            except etree.XMLSyntaxError as e:
+                logger.debug("XML parse error for %s: %s", sitemap_url, e)
+                return [], []
 
             # Check if this is a sitemap index (contains other sitemaps)
-            sitemaps = root.findall('.//sitemap')
-            if sitemaps:
-                print(f"Found sitemap index with {len(sitemaps)} nested sitemaps")
-                for sitemap in sitemaps:
-                    loc_elem = sitemap.find('loc')
-                    if loc_elem is not None and loc_elem.text:
-                        nested_url = loc_elem.text.strip()
-                        nested_urls = self._parse_sitemap(nested_url, depth + 1, max_depth)
-                        all_urls.extend(nested_urls)
+            if nested_sitemaps:
+                logger.debug("Found sitemap index with %d nested sitemaps", len(nested_sitemaps))
 
             # Extract URLs from sitemap
-            urls = root.findall('.//url')
-            if urls:
-                print(f"Found {len(urls)} URLs in sitemap")
-                for url_elem in urls:
-                    loc_elem = url_elem.find('loc')
-                    if loc_elem is not None and loc_elem.text:
-                        url = loc_elem.text.strip()
-                        all_urls.append(url)
-
-            if not all_urls:
-                print(f"No URLs found in sitemap {sitemap_url}")
-            return all_urls
+            if page_urls:
+                logger.debug("Found %d URLs in sitemap", len(page_urls))
+
+            if not nested_sitemaps and not page_urls:
+                logger.debug("No URLs found in sitemap %s", sitemap_url)
+            return nested_sitemaps, page_urls
 
         except Exception as e:
-            print(f"Error parsing sitemap {sitemap_url}: {e}")
-            import traceback
-            traceback.print_exc()
-            return []
+            logger.exception("Error parsing sitemap %s: %s", sitemap_url, e)
+            return [], []
+
+        finally:
+            if response is not None:
+                response.close()
+
+    def _open_sitemap_stream(self, source):
+        """Wrap a sitemap byte stream, decompressing gzipped sitemaps on the fly"""
+        stream = BufferedReader(source)
+
+        # Check the gzip magic bytes rather than the .gz extension: servers
+        # often send .xml.gz with Content-Encoding: gzip, already decoded above
+        if stream.peek(2)[:2] == b'\x1f\x8b':
+            return gzip.GzipFile(fileobj=stream)
+        return stream
+
+    def _extract_locs(self, source):
+        """
+        Stream <loc> entries out of sitemap XML without building the full tree
+
+        Args:
+            source: binary file-like object to read the XML from
+
+        Returns:
+            tuple: (nested sitemap URLs, page URLs)
+        """
+        nested_sitemaps = []
+        page_urls = []
+
+        # {*} matches <loc> in any (or no) namespace
+        context = etree.iterparse(source, events=('end',), tag='{*}loc',
+                                  resolve_entities=False, huge_tree=True)
+        for _, elem in context:
+            entry = elem.getparent()
+            loc = elem.text.strip() if elem.text else ''
+            if loc and entry is not None:
+                # Local name without building a QName: '{ns}url' -> 'url'
+                entry_tag = entry.tag.rpartition('}')[2]
+                if entry_tag == 'sitemap':
+                    nested_sitemaps.append(loc)
+                elif entry_tag == 'url':
+                    page_urls.append(loc)
+
+            # Free the entries we are done with to keep memory flat
+            elem.clear()
+            if entry is not None:
+                while entry.getprevious() is not None:
+                    del entry.getparent()[0]
+
+        return nested_sitemaps, page_urls
@@ -10,6 +10,7 @@ import re
 import random
 from urllib.parse import urljoin, urlparse
 from bs4 import BeautifulSoup
+from lxml import etree
 from concurrent.futures import ThreadPoolExecutor
 from urllib.robotparser import RobotFileParser
 import nest_asyncio
@@ -132,6 +133,7 @@ class WebCrawler:
             'proxy_url': None,
             'custom_headers': {},
             'discover_sitemaps': True,
+            'fast_link_parser': True,
             'enable_pagespeed': False,
             'enable_javascript': False,
             'js_wait_time': 3,
@@ -320,21 +322,38 @@ class WebCrawler:
         # Start memory monitoring
         self.memory_monitor.start_monitoring()
 
+    def _parse_link_document(self, html_content, soup, encoding=None):
+        """Parse HTML with lxml for link extraction, falling back to the BeautifulSoup tree
+
+        Raw bytes are decoded with the given encoding - without it libxml2 falls
+        back to Latin-1 for pages that only declare their charset in HTTP headers.
+        A plain etree parser is used rather than lxml.html, whose per-node Python
+        class lookup costs more than the link walk saves.
+        """
+        if self.config.get('fast_link_parser', True):
+            try:
+                if encoding and isinstance(html_content, bytes):
+                    parser = etree.HTMLParser(encoding=encoding)
+                else:
+                    parser = etree.HTMLParser()
+                link_doc = etree.fromstring(html_content, parser)
+                if link_doc is not None:
+                    return link_doc
+            except (etree.XMLSyntaxError, ValueError, LookupError):
+                pass
+        return soup
+
     def _discover_and_add_sitemap_urls(self, base_url):
         """Discover sitemaps and add URLs to crawl queue"""
         sitemap_urls = self.sitemap_parser.discover_sitemaps(base_url)
 
-        added_count = 0
-        filtered_count = 0
+        # Use less strict filtering for sitemap URLs - only check if internal/external policy allows it
+        # Skip extension and pattern filtering since these are explicitly listed in sitemaps
+        allowed_urls = [(url, 0) for url in sitemap_urls if self._should_crawl_sitemap_url(url, depth=0)]
+        filtered_count = len(sitemap_urls) - len(allowed_urls)
 
-        for url in sitemap_urls:
-            # Use less strict filtering for sitemap URLs - only check if internal/external policy allows it
-            # Skip extension and pattern filtering since these are explicitly listed in sitemaps
-            if self._should_crawl_sitemap_url(url, depth=0):
-                self.link_manager.add_url(url, 0)
-                added_count += 1
-            else:
-                filtered_count += 1
+        # Queue them under a single lock acquisition; already-queued URLs are not counted
+        added_count = self.link_manager.add_urls(allowed_urls)
 
         self.stats['discovered'] = self.link_manager.get_stats()['discovered']
         print(f"Sitemap processing: {added_count} added, {filtered_count} filtered")
@@ -441,7 +460,7 @@ class WebCrawler:
                 self.link_manager.all_links = loaded_links
                 # Rebuild links_set for duplicate detection
                 for link in loaded_links:
-                    link_key = f"{link['source_url']}|{link['target_url']}"
+                    link_key = (link['source_url'], link['target_url'])
                     self.link_manager.links_set.add(link_key)
 
             # Load issues and restore to issue detector
@@ -468,6 +487,7 @@ class WebCrawler:
                 # Restore visited URLs set
                 if 'visited_urls' in checkpoint:
                     self.link_manager.visited_urls = set(checkpoint['visited_urls'])
+                    self.link_manager.all_discovered_urls.update(self.link_manager.visited_urls)
 
                 print(f"Restored queue: {len(self.link_manager.discovered_urls)} pending, "
                       f"{len(self.link_manager.visited_urls)} visited")
@@ -921,8 +941,10 @@ class WebCrawler:
                 self.seo_extractor.extract_schema_org(soup, result)
 
                 # Collect all links
+                link_doc = self._parse_link_document(response.content, soup,
+                                                     soup.original_encoding or response.encoding)
                 links_before = len(self.link_manager.all_links)
-                self.link_manager.collect_all_links(soup, url, self.crawl_results)
+                self.link_manager.collect_all_links(link_doc, url, self.crawl_results)
                 links_after = len(self.link_manager.all_links)
 
                 # Add newly discovered links to unsaved batch
@@ -938,7 +960,7 @@ class WebCrawler:
                 )
 
                 if should_extract:
-                    self.link_manager.extract_links(soup, url, depth + 1, self._should_crawl_url)
+                    self.link_manager.extract_links(link_doc, url, depth + 1, self._should_crawl_url)
 
             # Populate linked_from after all link collection is complete
             result['linked_from'] = self.link_manager.get_source_pages(url)
@@ -1075,8 +1097,9 @@ class WebCrawler:
             self.seo_extractor.extract_schema_org(soup, result)
 
             # Collect all links
+            link_doc = self._parse_link_document(html_content, soup)
             links_before = len(self.link_manager.all_links)
-            self.link_manager.collect_all_links(soup, url, self.crawl_results)
+            self.link_manager.collect_all_links(link_doc, url, self.crawl_results)
             links_after = len(self.link_manager.all_links)
 
             # Add newly discovered links to unsaved batch
@@ -1092,7 +1115,7 @@ class WebCrawler:
             )
 
             if should_extract:
-                self.link_manager.extract_links(soup, url, depth + 1, self._should_crawl_url)
+                self.link_manager.extract_links(link_doc, url, depth + 1, self._should_crawl_url)
 
             # Populate linked_from after all link collection is complete
             result['linked_from'] = self.link_manager.get_source_pages(url)
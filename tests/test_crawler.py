@@ -0,0 +1,26 @@
+"""Tests for WebCrawler link document parsing"""
+from bs4 import BeautifulSoup
+
+from src.core.link_manager import LinkManager
+from src.crawler import WebCrawler
+
+
+def _collect_links(link_doc):
+    link_manager = LinkManager('example.com')
+    link_manager.collect_all_links(link_doc, 'https://example.com/', [])
+    return link_manager.all_links
+
+
+def test_fast_link_parser_decodes_non_ascii_page_without_meta_charset():
+    # UTF-8 page that only declares its charset in the HTTP header
+    html_content = '<html><body><a href="/café">Café 日本</a></body></html>'.encode('utf-8')
+    soup = BeautifulSoup(html_content, 'html.parser')
+    crawler = WebCrawler()
+
+    link_doc = crawler._parse_link_document(html_content, soup, soup.original_encoding or 'utf-8')
+
+    assert link_doc is not soup
+    links = _collect_links(link_doc)
+    assert [link['target_url'] for link in links] == ['https://example.com/café']
+    assert [link['anchor_text'] for link in links] == ['Café 日本']
+    assert links == _collect_links(soup)
@@ -0,0 +1,54 @@
+"""Tests for LinkManager"""
+from bs4 import BeautifulSoup
+from lxml import etree, html as lxml_html
+
+from src.core.link_manager import LinkManager
+
+
+def test_get_source_pages_keeps_first_seen_order():
+    link_manager = LinkManager('example.com')
+    doc = lxml_html.fromstring('<html><body><a href="/target">t</a></body></html>')
+    sources = [f'https://example.com/page-{i}' for i in (5, 1, 9, 3, 7, 1, 5)]
+
+    for source_url in sources:
+        link_manager.collect_all_links(doc, source_url, [])
+
+    assert link_manager.get_source_pages('https://example.com/target') == [
+        'https://example.com/page-5',
+        'https://example.com/page-1',
+        'https://example.com/page-9',
+        'https://example.com/page-3',
+        'https://example.com/page-7',
+    ]
+
+
+def test_lxml_and_soup_documents_give_the_same_links():
+    html_content = (
+        '<html><body><header><nav><ul>'
+        '<li><a href="/">Home</a></li><li><a href="/about">About</a></li>'
+        '</ul></nav></header>'
+        '<div id="main"><p><a href="/a">a</a><!-- c --><a href="/b">b</a></p>'
+        '<p><a href="https://other.com/">other</a></p>'
+        '<div><span><a href="/c">c</a></span></div><div><a href="/d">d</a></div></div>'
+        '<footer class="site-footer"><a href="/legal">Legal</a></footer>'
+        '</body></html>'
+    )
+
+    def links(doc):
+        link_manager = LinkManager('example.com')
+        link_manager.collect_all_links(doc, 'https://example.com/', [])
+        return link_manager.all_links
+
+    soup_links = links(BeautifulSoup(html_content, 'html.parser'))
+
+    assert links(etree.fromstring(html_content, etree.HTMLParser())) == soup_links
+    assert [(link['placement'], link['link_path']) for link in soup_links] == [
+        ('navigation', '//body/header/nav/ul/li[1]/a'),
+        ('navigation', '//body/header/nav/ul/li[2]/a'),
+        ('body', "//div[@id='main']/p[1]/a[1]"),
+        ('body', "//div[@id='main']/p[1]/a[2]"),
+        ('body', "//div[@id='main']/p[2]/a"),
+        ('body', "//div[@id='main']/div[1]/span/a"),
+        ('body', "//div[@id='main']/div[2]/a"),
+        ('footer', '//body/footer/a'),
+    ]